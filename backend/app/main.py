@@ -7,7 +7,7 @@ import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 from app.routers import actions, predict, dashboard
 from app.ws import websocket_endpoint
@@ -51,7 +51,7 @@ async def lifespan(app: FastAPI):
     except Exception as e:
                 logger.error(f"Error stopping services: {e}")
 
-app = FastAPI(title="NEUROSHIELD Backend", lifespan=lifespan)
+app = FastAPI(title="NEUROSHIELD Backend", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # --- CORS Middleware ---
 # In production, restrict allow_origins to your frontend URL(s)
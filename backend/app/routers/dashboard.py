@@ -9,6 +9,7 @@ import os
 import redis.asyncio as redis
 
 from app.services.db import db_service
+from app.services.model_service import get_model_service
 from app.services.network_automation import automation_service, ActionType
 from app.services.broadcaster import broadcaster, EventType
 from app.ws import websocket_endpoint, manager as ws_manager
@@ -21,8 +22,7 @@ router = APIRouter()
 async def get_dashboard_overview():
     """Get overall dashboard overview with key metrics"""
     try:
-        from app.services.model_service import ModelService
-        model_service = ModelService()
+        model_service = get_model_service()
         
         # Get all devices
         devices = model_service.get_devices()
@@ -86,8 +86,7 @@ async def get_dashboard_overview():
 async def get_automation_policies():
     """Get current automation policies"""
     try:
-        from app.services.model_service import ModelService
-        model_service = ModelService()
+        model_service = get_model_service()
         policies = model_service.get_automation_policies()
         return {
             "policies": policies,
@@ -100,8 +99,7 @@ async def get_automation_policies():
 async def update_automation_policies(policies: Dict[str, Any]):
     """Update automation policies"""
     try:
-        from app.services.model_service import ModelService
-        model_service = ModelService()
+        model_service = get_model_service()
         success = model_service.update_automation_policies(policies)
         if success:
             return {"message": "Policies updated successfully", "policies": model_service.get_automation_policies()}
@@ -114,8 +112,7 @@ async def update_automation_policies(policies: Dict[str, Any]):
 async def get_automated_predictions(k: int = Query(120, description="Number of recent data points to use")):
     """Get predictions with automation evaluation for all devices"""
     try:
-        from app.services.model_service import ModelService
-        model_service = ModelService()
+        model_service = get_model_service()
         predictions = await model_service.evaluate_all_devices_with_automation(k=k)
         return {
             "predictions": predictions,
@@ -228,8 +225,7 @@ async def execute_automation_action(action_id: str):
 async def get_device_dashboard(device_name: str, hours: int = Query(24, description="Hours of data to retrieve")):
     """Get detailed dashboard data for a specific device"""
     try:
-        from app.services.model_service import ModelService
-        model_service = ModelService()
+        model_service = get_model_service()
         
         # Get recent predictions
         prediction = model_service.predict_for_device(device_name, k=100)
@@ -294,8 +290,7 @@ async def get_hourly_metrics(device_name: Optional[str] = None, hours: int = Que
 async def get_active_alerts(device_name: Optional[str] = None, limit: int = Query(50)):
     """Get active alerts and recent events"""
     try:
-        from app.services.model_service import ModelService
-        model_service = ModelService()
+        model_service = get_model_service()
         
         # Get recent high-priority events
         events = db_service.get_recent_events(limit, device_name=device_name)
@@ -345,8 +340,7 @@ async def get_active_alerts(device_name: Optional[str] = None, limit: int = Quer
 async def get_network_topology():
     """Get network topology information"""
     try:
-        from app.services.model_service import ModelService
-        model_service = ModelService()
+        model_service = get_model_service()
         
         # Get device configurations
         device_configs = automation_service.get_all_device_configs()
@@ -418,8 +412,7 @@ async def get_network_topology():
 async def trigger_automation_action(action_data: Dict[str, Any]):
     """Trigger an automation action from the dashboard"""
     try:
-        from app.services.model_service import ModelService
-        model_service = ModelService()
+        model_service = get_model_service()
         
         action_type_str = action_data.get("action_type")
         device_name = action_data.get("device_name")
@@ -460,7 +453,6 @@ async def trigger_automation_action(action_data: Dict[str, Any]):
 async def get_action_status(action_id: str):
     """Get status of a specific action"""
     try:
-        from app.services.network_automation import automation_service
         status = automation_service.get_action_status(action_id)
         if not status:
             raise HTTPException(status_code=404, detail="Action not found")
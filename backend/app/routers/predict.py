@@ -3,13 +3,14 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from datetime import datetime
 
+from app.services.model_service import get_model_service
+
 router = APIRouter()
 
 @router.get("/api/predict/device/{device}")
 def predict_device(device: str, k: int = Query(120, description="Number of latest rows to use")):
     try:
-        from app.services.model_service import ModelService
-        svc = ModelService()
+        svc = get_model_service()
         res = svc.predict_for_device(device, k=k)
         if not res.get("ok", False):
             raise HTTPException(status_code=400, detail=res.get("reason") or res.get("error"))
@@ -22,8 +23,7 @@ def predict_device(device: str, k: int = Query(120, description="Number of lates
 @router.get("/api/predict/all")
 def predict_all(k: int = Query(120, description="Number of latest rows per device to use")):
     try:
-        from app.services.model_service import ModelService
-        svc = ModelService()
+        svc = get_model_service()
         results = svc.predict_all_devices(k=k)
         return {"devices": results}
     except FileNotFoundError as e:
@@ -35,8 +35,7 @@ def predict_all(k: int = Query(120, description="Number of latest rows per devic
 async def predict_with_automation(k: int = Query(120, description="Number of recent data points to use")):
     """Get predictions with automation evaluation for all devices"""
     try:
-        from app.services.model_service import ModelService
-        svc = ModelService()
+        svc = get_model_service()
         predictions = await svc.evaluate_all_devices_with_automation(k=k)
         return {
             "predictions": predictions,
@@ -51,8 +50,7 @@ async def predict_with_automation(k: int = Query(120, description="Number of rec
 async def predict_device_with_automation(device: str, k: int = Query(120, description="Number of recent data points to use")):
     """Get prediction with automation evaluation for a specific device"""
     try:
-        from app.services.model_service import ModelService
-        svc = ModelService()
+        svc = get_model_service()
         prediction = await svc.evaluate_and_automate(device, k=k)
         return {
             "prediction": prediction,
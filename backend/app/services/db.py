@@ -14,9 +14,9 @@ logger = logging.getLogger(__name__)
 class DatabaseService:
     def __init__(self, db_path: str = None):
         if db_path is None:
-            # Default to backend directory
+            # DB_PATH (as read by the workers), else the backend directory
             backend_dir = Path(__file__).parent.parent.parent
-            self.db_path = str(backend_dir / "metrics.db")
+            self.db_path = os.getenv("DB_PATH", str(backend_dir / "metrics.db"))
         else:
             self.db_path = db_path
         
@@ -121,6 +121,7 @@ class DatabaseService:
 
             # Create indexes for better performance
             conn.execute("CREATE INDEX IF NOT EXISTS idx_router_logs_device_time ON router_logs(device_name, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_router_logs_device_id ON router_logs(device_name, id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_device_time ON predictions(device_name, timestamp)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_actions_device_time ON actions_log(device_name, timestamp)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_events_device_time ON events(device_name, timestamp)")
@@ -1,21 +1,18 @@
 # backend/app/services/model_service.py
 import os
-import sys
 import json
 import asyncio
 import logging
+import threading
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
-# Add worker dir so we can reuse feature_builder
 HERE = Path(__file__).resolve()
 BASE_BACKEND = HERE.parents[2]   # .../NEUROSHIELD/backend
-WORKER_DIR = BASE_BACKEND / "worker"
-if str(WORKER_DIR) not in sys.path:
-    sys.path.insert(0, str(WORKER_DIR))
 
-# Now import the feature builder helpers (these are the canonical loader + fe builder)
-from feature_builder import load_router_logs, engineer_core_features
+# The feature builder helpers (these are the canonical loader + fe builder)
+from worker.feature_builder import load_devices, load_router_logs, load_last_k, engineer_core_features
+from app.services.redis_processor import action_score
 
 import joblib
 import pandas as pd
@@ -56,12 +53,19 @@ class ModelService:
         self.iso = joblib.load(iso_path)
 
         self.feature_cols = list(self.meta.get("feature_cols", []))
+        # Models trained before feature_dtype was recorded used float64
+        self.feature_dtype = self.meta.get("feature_dtype", "float64")
         self.threshold = float(self.meta.get("threshold", 0.6))
 
     def get_devices(self):
         """
-        Return list of distinct devices using the canonical loader (works for DB or CSV).
+        Return list of distinct devices (works for DB or CSV). Read on every call with
+        a DISTINCT query, so routers ingested after startup show up; the full loader
+        is only used when router_logs is empty.
         """
+        devices = load_devices()
+        if devices:
+            return devices
         df = load_router_logs()
         if df is None or df.empty:
             return []
@@ -73,6 +77,10 @@ class ModelService:
         Return last k rows for a device as a pandas DataFrame, sorted ascending by Timestamp.
         Uses canonical loader so column names are normalized.
         """
+        # Index seek on router_logs(device_name, id); the full loader covers the CSV fallback
+        df_tail = load_last_k(device, k)
+        if not df_tail.empty:
+            return df_tail.sort_values("Timestamp").reset_index(drop=True)
         df = load_router_logs()
         if df is None or df.empty:
             return pd.DataFrame()
@@ -80,8 +88,7 @@ class ModelService:
         df_dev = df[df["Device Name"] == device].copy()
         if df_dev.empty:
             return pd.DataFrame()
-        # Ensure Timestamp parsed and sort
-        df_dev["Timestamp"] = pd.to_datetime(df_dev["Timestamp"], errors="coerce")
+        # Timestamp is already parsed by the loader
         df_dev = df_dev.sort_values("Timestamp").reset_index(drop=True)
         # take last k (most recent) and return sorted ascending
         df_tail = df_dev.tail(int(k)).sort_values("Timestamp").reset_index(drop=True)
@@ -92,8 +99,8 @@ class ModelService:
         Align single-row Series/DataFrame X_row with saved feature columns.
         Returns a 1-row DataFrame with columns in the same order as model training.
         """
-        # Create DataFrame with proper float dtype from the start
-        aligned = pd.DataFrame(0.0, index=[0], columns=self.feature_cols, dtype=float)
+        # Create DataFrame with the training float dtype from the start
+        aligned = pd.DataFrame(0.0, index=[0], columns=self.feature_cols, dtype=self.feature_dtype)
         # If X_row is Series, iterate index; if DataFrame row, use its columns
         for c in X_row.index:
             if c in aligned.columns:
@@ -120,7 +127,7 @@ class ModelService:
             return {"device": device, "ok": False, "reason": "not enough data", "rows": len(df)}
 
         # Build features using canonical function
-        X_all, y_all, ts_df, _ = engineer_core_features(df)
+        X_all, y_all, ts_df, _ = engineer_core_features(df, inplace=True)
         if X_all.empty:
             return {"device": device, "ok": False, "reason": "no features after engineering"}
 
@@ -188,7 +195,7 @@ class ModelService:
             }
             
             # Use Redis sorted set for priority-based queuing
-            score = float(priority) + (pd.Timestamp.now().timestamp() / 1000000)
+            score = action_score(priority)
             await r.zadd(self.action_queue_key, {json.dumps(action_data): score})
             
             self.logger.info(f"Enqueued action: {action_type} for {device}")
@@ -201,13 +208,13 @@ class ModelService:
     async def evaluate_and_automate(self, device: str, k: int = 120):
         """Evaluate predictions and trigger automation based on policies"""
         try:
-            # Get prediction
-            prediction = self.predict_for_device(device, k=k)
+            # Get prediction (model and DB work is blocking, so keep it off the event loop)
+            prediction = await asyncio.to_thread(self.predict_for_device, device, k)
             if not prediction.get("ok"):
                 return prediction
             
             # Get latest metrics for additional context
-            df = self.get_last_k_for_device(device, k=1)
+            df = await asyncio.to_thread(self.get_last_k_for_device, device, 1)
             if not df.empty:
                 latest = df.iloc[-1]
                 utilization = latest.get("Bandwidth Used (MB/s)", 0) / max(latest.get("Bandwidth Allocated (MB/s)", 1), 1)
@@ -275,19 +282,24 @@ class ModelService:
 
     async def evaluate_all_devices_with_automation(self, k: int = 120):
         """Evaluate all devices and trigger automation policies"""
-        devices = self.get_devices()
-        results = []
+        devices = await asyncio.to_thread(self.get_devices)
         
-        for device in devices:
-            try:
-                result = await self.evaluate_and_automate(device, k=k)
-                results.append(result)
-            except Exception as e:
+        # Evaluate devices concurrently; one failure must not abort the rest
+        outcomes = await asyncio.gather(
+            *(self.evaluate_and_automate(device, k=k) for device in devices),
+            return_exceptions=True
+        )
+        
+        results = []
+        for device, result in zip(devices, outcomes):
+            if isinstance(result, Exception):
                 results.append({
                     "device": device, 
                     "ok": False, 
-                    "error": str(e)
+                    "error": str(result)
                 })
+            else:
+                results.append(result)
         
         return results
 
@@ -310,3 +322,17 @@ class ModelService:
         except Exception as e:
             self.logger.error(f"Failed to update policies: {e}")
             return False
+
+
+# Shared instance, created on first use so a missing model store only fails the requests that need it
+_model_service: Optional[ModelService] = None
+_model_service_lock = threading.Lock()
+
+def get_model_service() -> ModelService:
+    """Return the process-wide ModelService, loading the models on first call"""
+    global _model_service
+    if _model_service is None:
+        with _model_service_lock:
+            if _model_service is None:
+                _model_service = ModelService()
+    return _model_service
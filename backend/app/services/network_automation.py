@@ -1,11 +1,18 @@
 # backend/app/services/network_automation.py
 import asyncio
+import itertools
 import json
 import logging
-from typing import Dict, List, Any, Optional
+import os
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Mapping, Optional
 from datetime import datetime
 from enum import Enum
 import time
+import types
+
+from app.services.broadcaster import broadcaster
+from app.services.db import db_service
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +37,7 @@ class NetworkAction:
     def __init__(self, action_type: ActionType, device_name: str, parameters: Dict[str, Any], 
                  priority: int = 1, auto_execute: bool = True):
         self.action_type = action_type
+        self._action_type_value = action_type.value
         self.device_name = device_name
         self.parameters = parameters
         self.priority = priority
@@ -40,17 +48,26 @@ class NetworkAction:
         self.completed_at = None
         self.result = {}
         self.error_message = None
-        self.id = f"{action_type.value}_{device_name}_{int(time.time() * 1000)}"
+        self.id = f"{self._action_type_value}_{device_name}_{int(time.time() * 1000)}"
+
+    @property
+    def status(self) -> ActionStatus:
+        return self._status
+
+    @status.setter
+    def status(self, status: ActionStatus):
+        self._status = status
+        self._status_value = status.value
 
     def to_dict(self) -> Dict[str, Any]:
         return {
             "id": self.id,
-            "action_type": self.action_type.value,
+            "action_type": self._action_type_value,
             "device_name": self.device_name,
             "parameters": self.parameters,
             "priority": self.priority,
             "auto_execute": self.auto_execute,
-            "status": self.status.value,
+            "status": self._status_value,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
@@ -58,14 +75,59 @@ class NetworkAction:
             "error_message": self.error_message
         }
 
+class _ActionHistory(OrderedDict):
+    """
+    Completed actions by id, capped at maxsize with the oldest evicted first.
+    get() moves a hit to the newest end, so actions still being polled stay
+    resident; iterating (e.g. for a listing) leaves the order untouched.
+    """
+
+    def __init__(self, maxsize: int, on_evict=None):
+        super().__init__()
+        self.maxsize = maxsize
+        self.on_evict = on_evict  # called with each evicted action
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            _, evicted = self.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(evicted)
+
 class NetworkAutomationService:
+    # Simulated network latency per action type (seconds)
+    SIMULATED_DELAYS: Dict[ActionType, float] = {
+        ActionType.BANDWIDTH_ADJUSTMENT: 2.0,
+        ActionType.TRAFFIC_REROUTING: 3.0,
+        ActionType.QOS_UPDATE: 1.5,
+        ActionType.CONGESTION_MITIGATION: 2.5,
+        ActionType.ALERT_NOTIFICATION: 0.5,
+        ActionType.DEVICE_RESTART: 10.0,
+        ActionType.CONFIG_UPDATE: 3.0,
+        ActionType.MONITORING_ENABLE: 1.0,
+    }
+
     def __init__(self):
         self.action_queue = asyncio.Queue()
         self.running_actions = {}  # action_id -> NetworkAction
-        self.completed_actions = []  # Keep history
         self.max_history = 100
+        # Keep history; polled actions are refreshed so they outlive unread ones
+        self.completed_actions = _ActionHistory(
+            self.max_history, on_evict=self._unindex_action
+        )  # action_id -> NetworkAction
+        # device -> completed actions, newest first; holds exactly the actions in completed_actions
+        self._by_device: Dict[str, deque] = {}
         self.running = False
         self.max_concurrent_actions = 3
+        # Set NEUROSHIELD_SIMULATION=0 to skip the simulated network delays
+        self.simulation_enabled = os.getenv("NEUROSHIELD_SIMULATION", "1") != "0"
         
         # Device configurations (simulated)
         self.device_configs = {
@@ -94,6 +156,8 @@ class NetworkAutomationService:
                 "status": "active"
             }
         }
+        # Read-only view handed out to callers; reflects updates to device_configs
+        self._device_configs_view = types.MappingProxyType(self.device_configs)
 
     async def start(self):
         """Start the automation service"""
@@ -114,20 +178,21 @@ class NetworkAutomationService:
                 # Process actions from queue
                 if len(self.running_actions) < self.max_concurrent_actions:
                     try:
-                        action = await asyncio.wait_for(self.action_queue.get(), timeout=1.0)
+                        async with asyncio.timeout(1.0):
+                            action = await self.action_queue.get()
                         if action.auto_execute:
                             asyncio.create_task(self._execute_action(action))
                         else:
                             # Add to pending actions waiting for manual approval
                             self.running_actions[action.id] = action
                             await self._notify_action_pending(action)
-                    except asyncio.TimeoutError:
+                    except TimeoutError:
                         continue
                 
                 await asyncio.sleep(0.1)  # Small delay to prevent CPU spinning
                 
             except Exception as e:
-                logger.error(f"Error in action processing loop: {e}")
+                logger.error("Error in action processing loop: %s", e)
 
     async def _execute_action(self, action: NetworkAction):
         """Execute a network action"""
@@ -163,7 +228,7 @@ class NetworkAutomationService:
             action.completed_at = datetime.now()
             
             await self._notify_action_completed(action)
-            logger.info(f"Action completed: {action.id}")
+            logger.info("Action completed: %s", action.id)
             
         except Exception as e:
             action.status = ActionStatus.FAILED
@@ -171,16 +236,32 @@ class NetworkAutomationService:
             action.completed_at = datetime.now()
             
             await self._notify_action_failed(action)
-            logger.error(f"Action failed: {action.id} - {e}")
+            logger.error("Action failed: %s - %s", action.id, e)
         
         finally:
             # Move to completed actions
             if action.id in self.running_actions:
                 del self.running_actions[action.id]
             
-            self.completed_actions.append(action)
-            if len(self.completed_actions) > self.max_history:
-                self.completed_actions.pop(0)
+            self.completed_actions[action.id] = action
+            self._by_device.setdefault(action.device_name, deque()).appendleft(action)
+
+    def _unindex_action(self, action: NetworkAction):
+        """Drop an action evicted from the history from the per-device index"""
+        actions = self._by_device.get(action.device_name)
+        if actions is None:
+            return
+        try:
+            actions.remove(action)
+        except ValueError:
+            pass
+        if not actions:
+            del self._by_device[action.device_name]
+
+    async def _simulate_delay(self, action: NetworkAction):
+        """Sleep for the simulated network latency of an action, if simulation is enabled"""
+        if self.simulation_enabled:
+            await asyncio.sleep(self.SIMULATED_DELAYS.get(action.action_type, 0))
 
     async def _execute_bandwidth_adjustment(self, action: NetworkAction) -> Dict[str, Any]:
         """Execute bandwidth adjustment"""
@@ -188,7 +269,7 @@ class NetworkAutomationService:
         new_bandwidth = action.parameters.get("bandwidth", 100)
         
         # Simulate bandwidth adjustment
-        await asyncio.sleep(2)  # Simulate network call delay
+        await self._simulate_delay(action)
         
         if device_name in self.device_configs:
             old_bandwidth = self.device_configs[device_name]["current_bandwidth"]
@@ -205,7 +286,7 @@ class NetworkAutomationService:
 
     async def _execute_traffic_rerouting(self, action: NetworkAction) -> Dict[str, Any]:
         """Execute traffic rerouting"""
-        await asyncio.sleep(3)  # Simulate network configuration time
+        await self._simulate_delay(action)
         
         source_route = action.parameters.get("source_route")
         target_route = action.parameters.get("target_route")
@@ -219,7 +300,7 @@ class NetworkAutomationService:
 
     async def _execute_qos_update(self, action: NetworkAction) -> Dict[str, Any]:
         """Execute QoS policy update"""
-        await asyncio.sleep(1.5)
+        await self._simulate_delay(action)
         
         policy = action.parameters.get("policy", "medium")
         priority_flows = action.parameters.get("priority_flows", [])
@@ -233,7 +314,7 @@ class NetworkAutomationService:
 
     async def _execute_congestion_mitigation(self, action: NetworkAction) -> Dict[str, Any]:
         """Execute congestion mitigation actions"""
-        await asyncio.sleep(2.5)
+        await self._simulate_delay(action)
         
         mitigation_type = action.parameters.get("type", "bandwidth_limit")
         severity = action.parameters.get("severity", "medium")
@@ -260,7 +341,7 @@ class NetworkAutomationService:
 
     async def _execute_alert_notification(self, action: NetworkAction) -> Dict[str, Any]:
         """Execute alert notification"""
-        await asyncio.sleep(0.5)
+        await self._simulate_delay(action)
         
         recipients = action.parameters.get("recipients", ["admin@company.com"])
         alert_type = action.parameters.get("alert_type", "info")
@@ -276,7 +357,7 @@ class NetworkAutomationService:
 
     async def _execute_device_restart(self, action: NetworkAction) -> Dict[str, Any]:
         """Execute device restart (simulated)"""
-        await asyncio.sleep(10)  # Simulate restart time
+        await self._simulate_delay(action)  # Simulate restart time
         
         device_name = action.device_name
         restart_type = action.parameters.get("type", "soft")
@@ -284,7 +365,8 @@ class NetworkAutomationService:
         if device_name in self.device_configs:
             # Simulate device restart
             self.device_configs[device_name]["status"] = "restarting"
-            await asyncio.sleep(5)
+            if self.simulation_enabled:
+                await asyncio.sleep(5)
             self.device_configs[device_name]["status"] = "active"
             
             return {
@@ -298,7 +380,7 @@ class NetworkAutomationService:
 
     async def _execute_config_update(self, action: NetworkAction) -> Dict[str, Any]:
         """Execute configuration update"""
-        await asyncio.sleep(3)
+        await self._simulate_delay(action)
         
         config_section = action.parameters.get("section", "general")
         config_data = action.parameters.get("config", {})
@@ -312,7 +394,7 @@ class NetworkAutomationService:
 
     async def _execute_monitoring_enable(self, action: NetworkAction) -> Dict[str, Any]:
         """Execute monitoring configuration"""
-        await asyncio.sleep(1)
+        await self._simulate_delay(action)
         
         monitoring_type = action.parameters.get("type", "enhanced")
         interval = action.parameters.get("interval", 60)
@@ -327,51 +409,35 @@ class NetworkAutomationService:
     # Notification methods (integrate with broadcaster)
     async def _notify_action_pending(self, action: NetworkAction):
         """Notify that an action is pending approval"""
-        try:
-            from app.services.broadcaster import broadcaster
-            await broadcaster.emit_system_alert(
-                f"Action pending approval: {action.action_type.value}",
-                "pending_action",
-                action.device_name
-            )
-        except ImportError:
-            logger.warning("Broadcaster not available for notifications")
+        await broadcaster.emit_system_alert(
+            f"Action pending approval: {action._action_type_value}",
+            "pending_action",
+            action.device_name
+        )
 
     async def _notify_action_started(self, action: NetworkAction):
         """Notify that an action has started"""
-        try:
-            from app.services.broadcaster import broadcaster
-            await broadcaster.emit_action_executed(
-                action.device_name,
-                action.action_type.value,
-                {"status": "started", "parameters": action.parameters}
-            )
-        except ImportError:
-            logger.warning("Broadcaster not available for notifications")
+        await broadcaster.emit_action_executed(
+            action.device_name,
+            action._action_type_value,
+            {"status": "started", "parameters": action.parameters}
+        )
 
     async def _notify_action_completed(self, action: NetworkAction):
         """Notify that an action has completed"""
-        try:
-            from app.services.broadcaster import broadcaster
-            await broadcaster.emit_action_executed(
-                action.device_name,
-                action.action_type.value,
-                {"status": "completed", "result": action.result}
-            )
-        except ImportError:
-            logger.warning("Broadcaster not available for notifications")
+        await broadcaster.emit_action_executed(
+            action.device_name,
+            action._action_type_value,
+            {"status": "completed", "result": action.result}
+        )
 
     async def _notify_action_failed(self, action: NetworkAction):
         """Notify that an action has failed"""
-        try:
-            from app.services.broadcaster import broadcaster
-            await broadcaster.emit_system_alert(
-                f"Action failed: {action.error_message}",
-                "error",
-                action.device_name
-            )
-        except ImportError:
-            logger.warning("Broadcaster not available for notifications")
+        await broadcaster.emit_system_alert(
+            f"Action failed: {action.error_message}",
+            "error",
+            action.device_name
+        )
 
     # Public methods
     async def queue_action(self, action_type: ActionType, device_name: str, 
@@ -381,14 +447,11 @@ class NetworkAutomationService:
         action = NetworkAction(action_type, device_name, parameters, priority, auto_execute)
         await self.action_queue.put(action)
         
-        # Store in database
-        try:
-            from app.services.db import db_service
-            db_service.insert_action(device_name, action_type.value, parameters)
-        except ImportError:
-            logger.warning("Database service not available")
+        # Store in database; the SQLite write is blocking, and each call opens
+        # its own connection, so it is safe to run in a worker thread
+        await asyncio.to_thread(db_service.insert_action, device_name, action._action_type_value, parameters)
         
-        logger.info(f"Action queued: {action.id}")
+        logger.info("Action queued: %s", action.id)
         return action.id
 
     async def cancel_action(self, action_id: str) -> bool:
@@ -408,19 +471,18 @@ class NetworkAutomationService:
         if action_id in self.running_actions:
             return self.running_actions[action_id].to_dict()
         
-        # Check completed actions
-        for action in self.completed_actions:
-            if action.id == action_id:
-                return action.to_dict()
-        
-        return None
+        # Check completed actions (a hit refreshes the action in the history)
+        action = self.completed_actions.get(action_id)
+        return action.to_dict() if action else None
 
     def get_all_actions(self, device_name: str = None, limit: int = 50) -> List[Dict[str, Any]]:
         """Get all actions (running and completed)"""
-        all_actions = list(self.running_actions.values()) + self.completed_actions
-        
         if device_name:
-            all_actions = [a for a in all_actions if a.device_name == device_name]
+            running = [a for a in self.running_actions.values() if a.device_name == device_name]
+            completed = list(itertools.islice(self._by_device.get(device_name, ()), limit))
+            all_actions = running + completed
+        else:
+            all_actions = list(self.running_actions.values()) + list(self.completed_actions.values())
         
         # Sort by creation time (newest first)
         all_actions.sort(key=lambda x: x.created_at, reverse=True)
@@ -431,9 +493,13 @@ class NetworkAutomationService:
         """Get current device configuration"""
         return self.device_configs.get(device_name)
 
-    def get_all_device_configs(self) -> Dict[str, Any]:
-        """Get all device configurations"""
-        return self.device_configs.copy()
+    def get_all_device_configs(self) -> Mapping[str, Any]:
+        """Get a read-only view of all device configurations"""
+        return self._device_configs_view
+
+    def update_device_config(self, device_name: str, config: Dict[str, Any]):
+        """Create or update a device configuration"""
+        self.device_configs.setdefault(device_name, {}).update(config)
 
     # Convenience methods for common actions
     async def adjust_bandwidth(self, device_name: str, bandwidth: float, auto_execute: bool = True) -> str:
@@ -6,11 +6,13 @@ Falls back to in-memory storage when Redis is not available
 """
 
 import asyncio
-import json
+import itertools
 import logging
 import os
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
+import orjson
 import redis.asyncio as redis
 
 from app.services.network_automation import automation_service, ActionType
@@ -19,14 +21,33 @@ from app.ws import manager as ws_manager
 
 logger = logging.getLogger(__name__)
 
+def _dumps(obj: Any) -> str:
+    """Serialize an action for the Redis queue"""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+# Submission counter used to break ties between actions of equal priority.
+# Shared by every producer of the action queue so FIFO order holds queue-wide
+_score_counter = itertools.count()
+
+def action_score(priority: Any) -> float:
+    """ZSET score for an action queue member: priority first, then submission order"""
+    return float(priority) * 1e9 + next(_score_counter)
+
 class RedisActionProcessor:
     def __init__(self):
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
         self.action_queue_key = os.getenv("ACTION_QUEUE_KEY", "neuroshield:actions")
         self.running = False
         self.processing_interval = 5  # seconds
+        self.batch_size = 50  # actions popped per cycle
+        self.max_retries = 3
+        self.retry_delay = 5  # seconds before the first retry, doubled for each later one
+        self.retry_queue_key = f"{self.action_queue_key}:retry"  # failed actions scored by retry time
         self.redis_available = False
         self.fallback_queue: List[Dict[str, Any]] = []  # In-memory fallback
+        self.ws_flush_delay = 0.05  # seconds to coalesce automation updates
+        self._ws_buffer: List[Tuple[str, Dict[str, Any]]] = []  # (device, update) awaiting flush
+        self._flush_task: Optional[asyncio.Task] = None
         
     async def _get_redis_connection(self):
         """Get Redis connection with fallback"""
@@ -39,7 +60,7 @@ class RedisActionProcessor:
             return r
         except Exception as e:
             self.redis_available = False
-            logger.warning(f"Redis not available, using in-memory fallback: {e}")
+            logger.warning("Redis not available, using in-memory fallback: %s", e)
             return None
     
     async def start(self):
@@ -63,7 +84,7 @@ class RedisActionProcessor:
                 await self._process_pending_actions()
                 await asyncio.sleep(self.processing_interval)
             except Exception as e:
-                logger.error(f"Error in action processing loop: {e}")
+                logger.error("Error in action processing loop: %s", e)
                 await asyncio.sleep(self.processing_interval)
     
     async def _process_pending_actions(self):
@@ -74,7 +95,7 @@ class RedisActionProcessor:
             else:
                 await self._process_fallback_actions()
         except Exception as e:
-            logger.error(f"Error processing pending actions: {e}")
+            logger.error("Error processing pending actions: %s", e)
     
     async def _process_redis_actions(self):
         """Process actions from Redis queue"""
@@ -83,55 +104,84 @@ class RedisActionProcessor:
             if not r:
                 return
             
-            # Get all pending actions (sorted by priority)
-            actions = await r.zrange(self.action_queue_key, 0, -1, withscores=True)
+            await self._promote_due_retries(r)
+            
+            # Atomically pop the next batch so concurrent processors never share an action
+            actions = await r.zpopmin(self.action_queue_key, count=self.batch_size)
             
             if not actions:
                 return
             
-            logger.info(f"Processing {len(actions)} pending actions from Redis")
+            logger.info("Processing %s pending actions from Redis", len(actions))
             
             for action_json, score in actions:
                 try:
                     # Parse action data
-                    action_data = json.loads(action_json)
+                    action_data = orjson.loads(action_json)
                     device = action_data.get("device")
                     action_type = action_data.get("action_type")
                     parameters = action_data.get("parameters", {})
                     priority = action_data.get("priority", 1)
                     
-                    logger.info(f"Processing action: {action_type} for {device} (priority: {priority})")
+                    logger.info("Processing action: %s for %s (priority: %s)", action_type, device, priority)
                     
                     # Execute the action
                     success = await self._execute_action(action_data)
                     
                     if success:
-                        # Remove from queue
-                        await r.zrem(self.action_queue_key, action_json)
-                        logger.info(f"Action {action_type} for {device} executed successfully")
+                        logger.info("Action %s for %s executed successfully", action_type, device)
                         
                         # Send WebSocket update
                         await self._send_automation_update(device, action_data, "completed")
                     else:
-                        logger.error(f"Failed to execute action {action_type} for {device}")
-                        # Keep in queue for retry (could implement retry logic here)
+                        logger.error("Failed to execute action %s for %s", action_type, device)
+                        await self._requeue_action(r, action_data, score)
                         
-                except json.JSONDecodeError as e:
-                    logger.error(f"Invalid action JSON: {e}")
-                    # Remove invalid action
-                    await r.zrem(self.action_queue_key, action_json)
+                except orjson.JSONDecodeError as e:
+                    # Invalid actions are already popped, so they are simply dropped
+                    logger.error("Invalid action JSON: %s", e)
                 except Exception as e:
-                    logger.error(f"Error processing action: {e}")
+                    logger.error("Error processing action: %s", e)
                     
         except Exception as e:
-            logger.error(f"Error processing Redis actions: {e}")
+            logger.error("Error processing Redis actions: %s", e)
+
+    async def _requeue_action(self, r, action_data: Dict[str, Any], score: float):
+        """Put a failed action back on the Redis queue until it runs out of retries"""
+        retries = action_data.get("retries", 0) + 1
+        if retries > self.max_retries:
+            logger.error("Dropping action %s for %s after %s retries", action_data.get('action_type'), action_data.get('device'), self.max_retries)
+            return
+
+        # Park it in the retry set until its backoff expires instead of back at the head of the queue
+        action_data["retries"] = retries
+        action_data["queue_score"] = score
+        retry_at = time.time() + self.retry_delay * 2 ** (retries - 1)
+        await r.zadd(self.retry_queue_key, {_dumps(action_data): retry_at})
+
+    async def _promote_due_retries(self, r):
+        """Move failed actions whose backoff has expired back onto the action queue"""
+        due = await r.zrangebyscore(self.retry_queue_key, "-inf", time.time())
+        for member in due:
+            # ZREM succeeds for exactly one processor, which then owns the retry
+            if not await r.zrem(self.retry_queue_key, member):
+                continue
+            try:
+                action_data = orjson.loads(member)
+            except orjson.JSONDecodeError as e:
+                logger.error("Invalid retry action JSON: %s", e)
+                continue
+            score = action_data.pop("queue_score", None)
+            if score is None:
+                score = action_score(action_data.get("priority", 1))
+            await r.zadd(self.action_queue_key, {_dumps(action_data): score})
     
     async def _process_fallback_actions(self):
         """Process actions from in-memory fallback queue"""
         if not self.fallback_queue:
             return
         
-        logger.info(f"Processing {len(self.fallback_queue)} pending actions from fallback queue")
+        logger.info("Processing %s pending actions from fallback queue", len(self.fallback_queue))
         
         # Process actions in priority order
         self.fallback_queue.sort(key=lambda x: x.get("priority", 1), reverse=True)
@@ -143,21 +193,21 @@ class RedisActionProcessor:
                 action_type = action_data.get("action_type")
                 priority = action_data.get("priority", 1)
                 
-                logger.info(f"Processing fallback action: {action_type} for {device} (priority: {priority})")
+                logger.info("Processing fallback action: %s for %s (priority: %s)", action_type, device, priority)
                 
                 # Execute the action
                 success = await self._execute_action(action_data)
                 
                 if success:
-                    logger.info(f"Fallback action {action_type} for {device} executed successfully")
+                    logger.info("Fallback action %s for %s executed successfully", action_type, device)
                     # Send WebSocket update
                     await self._send_automation_update(device, action_data, "completed")
                     processed_actions.append(action_data)
                 else:
-                    logger.error(f"Failed to execute fallback action {action_type} for {device}")
+                    logger.error("Failed to execute fallback action %s for %s", action_type, device)
                     
             except Exception as e:
-                logger.error(f"Error processing fallback action: {e}")
+                logger.error("Error processing fallback action: %s", e)
         
         # Remove processed actions from queue
         for action in processed_actions:
@@ -207,11 +257,11 @@ class RedisActionProcessor:
             return True
             
         except Exception as e:
-            logger.error(f"Failed to execute action {action_type}: {e}")
+            logger.error("Failed to execute action %s: %s", action_type, e)
             return False
     
     async def _send_automation_update(self, device: str, action_data: Dict[str, Any], status: str):
-        """Send automation update via WebSocket"""
+        """Buffer an automation update; updates within ws_flush_delay are sent together"""
         try:
             update_data = {
                 "action_type": action_data.get("action_type"),
@@ -220,18 +270,39 @@ class RedisActionProcessor:
                 "timestamp": datetime.now().isoformat()
             }
             
-            # Send via WebSocket manager
-            await ws_manager.send_automation_update(device, update_data)
-            
-            # Send via broadcaster
-            await broadcaster.emit_action_executed(
-                device,
-                action_data.get("action_type"),
-                update_data
-            )
+            self._ws_buffer.append((device, update_data))
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._flush_ws_updates())
             
         except Exception as e:
-            logger.error(f"Failed to send automation update: {e}")
+            logger.error("Failed to send automation update: %s", e)
+    
+    async def _flush_ws_updates(self):
+        """Send buffered automation updates as one WebSocket message per device"""
+        await asyncio.sleep(self.ws_flush_delay)
+        # Clear the task before sending so updates buffered mid-send schedule a new flush
+        self._flush_task = None
+        updates, self._ws_buffer = self._ws_buffer, []
+        
+        by_device: Dict[str, List[Dict[str, Any]]] = {}
+        for device, update_data in updates:
+            by_device.setdefault(device, []).append(update_data)
+        
+        for device, device_updates in by_device.items():
+            try:
+                # Send via WebSocket manager
+                await ws_manager.send_automation_updates(device, device_updates)
+                
+                # Send via broadcaster
+                for update_data in device_updates:
+                    await broadcaster.emit_action_executed(
+                        device,
+                        update_data["action_type"],
+                        update_data
+                    )
+                    
+            except Exception as e:
+                logger.error("Failed to send automation updates for %s: %s", device, e)
     
     async def add_action(self, action_data: Dict[str, Any]) -> bool:
         """Add a new action to the queue (Redis or fallback)"""
@@ -246,7 +317,35 @@ class RedisActionProcessor:
                 return await self._add_action_to_fallback(action_data)
                 
         except Exception as e:
-            logger.error(f"Failed to add action to queue: {e}")
+            logger.error("Failed to add action to queue: %s", e)
+            return False
+    
+    async def add_actions(self, actions: List[Dict[str, Any]]) -> bool:
+        """Add several actions to the queue in a single round trip (Redis or fallback)"""
+        try:
+            now = datetime.now().isoformat()
+            for action_data in actions:
+                action_data.setdefault("timestamp", now)
+            
+            if self.redis_available:
+                r = await self._get_redis_connection()
+                if not r:
+                    return False
+                
+                # One ZADD with every member instead of a command per action
+                mapping = {
+                    _dumps(action_data): action_score(action_data.get("priority", 1))
+                    for action_data in actions
+                }
+                await r.zadd(self.action_queue_key, mapping)
+                logger.info("Added %s actions to Redis queue", len(actions))
+            else:
+                self.fallback_queue.extend(actions)
+                logger.info("Added %s actions to fallback queue", len(actions))
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to add actions to queue: %s", e)
             return False
     
     async def _add_action_to_redis(self, action_data: Dict[str, Any]) -> bool:
@@ -256,29 +355,29 @@ class RedisActionProcessor:
             if not r:
                 return False
             
-            # Calculate priority score
+            # Calculate priority score (priority first, then submission order)
             priority = action_data.get("priority", 1)
-            score = float(priority) + (datetime.now().timestamp() / 1000000)
+            score = action_score(priority)
             
             # Add to queue
-            await r.zadd(self.action_queue_key, {json.dumps(action_data): score})
+            await r.zadd(self.action_queue_key, {_dumps(action_data): score})
             
-            logger.info(f"Added action to Redis queue: {action_data.get('action_type')} for {action_data.get('device')}")
+            logger.info("Added action to Redis queue: %s for %s", action_data.get('action_type'), action_data.get('device'))
             return True
             
         except Exception as e:
-            logger.error(f"Failed to add action to Redis queue: {e}")
+            logger.error("Failed to add action to Redis queue: %s", e)
             return False
     
     async def _add_action_to_fallback(self, action_data: Dict[str, Any]) -> bool:
         """Add action to fallback queue"""
         try:
             self.fallback_queue.append(action_data)
-            logger.info(f"Added action to fallback queue: {action_data.get('action_type')} for {action_data.get('device')}")
+            logger.info("Added action to fallback queue: %s for %s", action_data.get('action_type'), action_data.get('device'))
             return True
             
         except Exception as e:
-            logger.error(f"Failed to add action to fallback queue: {e}")
+            logger.error("Failed to add action to fallback queue: %s", e)
             return False
     
     async def get_queue_status(self) -> Dict[str, Any]:
@@ -290,7 +389,7 @@ class RedisActionProcessor:
                 return await self._get_fallback_queue_status()
                 
         except Exception as e:
-            logger.error(f"Failed to get queue status: {e}")
+            logger.error("Failed to get queue status: %s", e)
             return {"error": str(e)}
     
     async def _get_redis_queue_status(self) -> Dict[str, Any]:
@@ -309,10 +408,10 @@ class RedisActionProcessor:
             pending_actions = []
             for action_json, score in actions:
                 try:
-                    action_data = json.loads(action_json)
+                    action_data = orjson.loads(action_json)
                     action_data["priority_score"] = score
                     pending_actions.append(action_data)
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     continue
             
             return {
@@ -324,7 +423,7 @@ class RedisActionProcessor:
             }
             
         except Exception as e:
-            logger.error(f"Failed to get Redis queue status: {e}")
+            logger.error("Failed to get Redis queue status: %s", e)
             return {"error": str(e)}
     
     async def _get_fallback_queue_status(self) -> Dict[str, Any]:
@@ -345,7 +444,7 @@ class RedisActionProcessor:
             }
             
         except Exception as e:
-            logger.error(f"Failed to get fallback queue status: {e}")
+            logger.error("Failed to get fallback queue status: %s", e)
             return {"error": str(e)}
 
 # Global instance
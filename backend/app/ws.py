@@ -1,46 +1,95 @@
 # backend/app/ws.py
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List
-import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set
+import orjson
 import asyncio
 import logging
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Errors a send raises once the client has gone away
+_SEND_ERRORS = (WebSocketDisconnect, RuntimeError, OSError)
+
+def _dumps(obj: Any) -> str:
+    """Serialize a message for a text frame"""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+# (iso string, monotonic time it was taken) shared by messages within one tick
+_ts_cache = ("", float("-inf"))
+
+def _now_iso() -> str:
+    """Current time as ISO string, reused for messages sent within 10 ms"""
+    global _ts_cache
+    t = time.monotonic()
+    if t - _ts_cache[1] < 0.01:
+        return _ts_cache[0]
+    s = datetime.now().isoformat()
+    _ts_cache = (s, t)
+    return s
+
+def _batch_frame(events: List[dict], device: str = None) -> dict:
+    """Wrap coalesced messages in a batch frame; a single message is sent unchanged"""
+    if len(events) == 1:
+        return events[0]
+    frame = {"type": "batch"}
+    if device:
+        frame["device"] = device
+    frame["timestamp"] = _now_iso()
+    frame["events"] = events
+    return frame
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Dict[WebSocket, None] = {}  # insertion-ordered set
         self.device_subscriptions = {}  # websocket -> set of device names
+        self.device_subscribers: Dict[str, Set[WebSocket]] = defaultdict(set)  # device -> websockets
+        self.batch_window = 0.01  # seconds to coalesce prediction/metrics updates
+        self._pending_predictions: Dict[str, List[dict]] = {}  # device -> messages awaiting flush
+        self._prediction_flush_tasks: Dict[str, asyncio.Task] = {}
+        self._pending_metrics: List[dict] = []
+        self._metrics_flush_task: Optional[asyncio.Task] = None
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
+        self.active_connections[websocket] = None
+        logger.info("WebSocket connected. Total connections: %s", len(self.active_connections))
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        if websocket in self.device_subscriptions:
-            del self.device_subscriptions[websocket]
-        logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
+        self.active_connections.pop(websocket, None)
+        for device in self.device_subscriptions.pop(websocket, ()):
+            self._remove_subscriber(device, websocket)
+        logger.info("WebSocket disconnected. Total connections: %s", len(self.active_connections))
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         try:
             await websocket.send_text(message)
-        except Exception as e:
-            logger.error(f"Error sending personal message: {e}")
+        except _SEND_ERRORS as e:
+            logger.debug("Error sending personal message: %s", e)
             self.disconnect(websocket)
 
-    async def broadcast(self, message: str):
-        """Broadcast to all connected clients"""
+    async def _send_to_all(self, connections: List[WebSocket], message: str) -> List[WebSocket]:
+        """Send a message to several clients concurrently, returning the ones that failed"""
+        results = await asyncio.gather(
+            *(connection.send_text(message) for connection in connections),
+            return_exceptions=True
+        )
         disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting to connection: {e}")
+        for connection, result in zip(connections, results):
+            if isinstance(result, _SEND_ERRORS):
+                logger.debug("Error broadcasting to connection: %s", result)
                 disconnected.append(connection)
+            elif isinstance(result, Exception):
+                logger.error("Unexpected error broadcasting to connection: %s", result)
+                disconnected.append(connection)
+        return disconnected
+
+    async def broadcast(self, message: str):
+        """Broadcast to all connected clients"""
+        # Snapshot so connects/disconnects during the sends don't affect iteration
+        disconnected = await self._send_to_all(list(self.active_connections), message)
         
         # Clean up disconnected clients
         for conn in disconnected:
@@ -48,14 +97,8 @@ class ConnectionManager:
 
     async def broadcast_to_device_subscribers(self, device: str, message: str):
         """Broadcast only to clients subscribed to a specific device"""
-        disconnected = []
-        for connection, devices in self.device_subscriptions.items():
-            if device in devices:
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    logger.error(f"Error broadcasting to device subscriber: {e}")
-                    disconnected.append(connection)
+        targets = list(self.device_subscribers.get(device, ()))
+        disconnected = await self._send_to_all(targets, message)
         
         # Clean up disconnected clients
         for conn in disconnected:
@@ -66,40 +109,68 @@ class ConnectionManager:
         if websocket not in self.device_subscriptions:
             self.device_subscriptions[websocket] = set()
         self.device_subscriptions[websocket].add(device)
+        self.device_subscribers[device].add(websocket)
 
     def unsubscribe_from_device(self, websocket: WebSocket, device: str):
         """Unsubscribe a websocket from updates for a specific device"""
         if websocket in self.device_subscriptions:
             self.device_subscriptions[websocket].discard(device)
+        self._remove_subscriber(device, websocket)
+
+    def _remove_subscriber(self, device: str, websocket: WebSocket):
+        """Drop a websocket from the reverse index, removing empty device entries"""
+        subscribers = self.device_subscribers.get(device)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.device_subscribers[device]
 
     async def send_prediction_update(self, device: str, prediction_data: dict):
         """Send real-time prediction updates for a device"""
         message = {
             "type": "prediction_update",
             "device": device,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now_iso(),
             "data": prediction_data
         }
-        await self.broadcast_to_device_subscribers(device, json.dumps(message))
+        self._pending_predictions.setdefault(device, []).append(message)
+        if device not in self._prediction_flush_tasks:
+            self._prediction_flush_tasks[device] = asyncio.create_task(self._flush_predictions(device))
+
+    async def _flush_predictions(self, device: str):
+        """Send the prediction updates buffered for a device as one frame"""
+        await asyncio.sleep(self.batch_window)
+        self._prediction_flush_tasks.pop(device, None)
+        events = self._pending_predictions.pop(device, [])
+        if events:
+            await self.broadcast_to_device_subscribers(device, _dumps(_batch_frame(events, device)))
 
     async def send_automation_update(self, device: str, action_data: dict):
         """Send real-time automation action updates for a device"""
-        message = {
-            "type": "automation_update",
-            "device": device,
-            "timestamp": datetime.now().isoformat(),
-            "data": action_data
-        }
-        await self.broadcast_to_device_subscribers(device, json.dumps(message))
+        await self.send_automation_updates(device, [action_data])
+
+    async def send_automation_updates(self, device: str, updates: List[dict]):
+        """Send several automation updates for a device as one frame (a lone update is sent unchanged)"""
+        timestamp = _now_iso()
+        events = [
+            {
+                "type": "automation_update",
+                "device": device,
+                "timestamp": timestamp,
+                "data": action_data
+            }
+            for action_data in updates
+        ]
+        await self.broadcast_to_device_subscribers(device, _dumps(_batch_frame(events, device)))
 
     async def send_policy_update(self, policy_data: dict):
         """Send policy updates to all subscribers"""
         message = {
             "type": "policy_update",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now_iso(),
             "data": policy_data
         }
-        await self.broadcast(json.dumps(message))
+        await self.broadcast(_dumps(message))
 
     async def send_system_alert(self, alert_type: str, message: str, device: str = None):
         """Send system alerts"""
@@ -108,22 +179,33 @@ class ConnectionManager:
             "alert_type": alert_type,
             "message": message,
             "device": device,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
         
         if device:
-            await self.broadcast_to_device_subscribers(device, json.dumps(alert))
+            await self.broadcast_to_device_subscribers(device, _dumps(alert))
         else:
-            await self.broadcast(json.dumps(alert))
+            await self.broadcast(_dumps(alert))
 
     async def send_metrics_update(self, metrics: dict):
         """Send general metrics updates"""
         message = {
             "type": "metrics_update",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now_iso(),
             "data": metrics
         }
-        await self.broadcast(json.dumps(message))
+        self._pending_metrics.append(message)
+        if self._metrics_flush_task is None or self._metrics_flush_task.done():
+            self._metrics_flush_task = asyncio.create_task(self._flush_metrics())
+
+    async def _flush_metrics(self):
+        """Send the buffered metrics updates as one frame"""
+        await asyncio.sleep(self.batch_window)
+        # Clear the task before broadcasting so updates arriving mid-send schedule a new flush
+        self._metrics_flush_task = None
+        events, self._pending_metrics = self._pending_metrics, []
+        if events:
+            await self.broadcast(_dumps(_batch_frame(events)))
 
 # Global connection manager instance
 manager = ConnectionManager()
@@ -132,62 +214,74 @@ async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
-            data = await websocket.receive_text()
+            # Accept both text and binary frames; orjson parses either without a decode step
+            event = await websocket.receive()
+            if event["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(event.get("code", 1000))
+            data = event.get("bytes") or event.get("text") or ""
             try:
-                message = json.loads(data)
+                message = orjson.loads(data)
                 await handle_websocket_message(websocket, message)
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 await manager.send_personal_message(
-                    json.dumps({"error": "Invalid JSON format"}), 
+                    _dumps({"error": "Invalid JSON format"}), 
                     websocket
                 )
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
-        logger.error(f"WebSocket error: {e}")
+        logger.error("WebSocket error: %s", e)
         manager.disconnect(websocket)
 
-async def handle_websocket_message(websocket: WebSocket, message: dict):
-    """Handle incoming WebSocket messages from clients"""
-    msg_type = message.get("type")
-    
-    if msg_type == "subscribe":
-        device = message.get("device")
-        if device:
-            manager.subscribe_to_device(websocket, device)
-            await manager.send_personal_message(
-                json.dumps({
-                    "type": "subscription_confirmed",
-                    "device": device,
-                    "message": f"Subscribed to {device} updates"
-                }),
-                websocket
-            )
-    
-    elif msg_type == "unsubscribe":
-        device = message.get("device")
-        if device:
-            manager.unsubscribe_from_device(websocket, device)
-            await manager.send_personal_message(
-                json.dumps({
-                    "type": "unsubscription_confirmed", 
-                    "device": device,
-                    "message": f"Unsubscribed from {device} updates"
-                }),
-                websocket
-            )
-    
-    elif msg_type == "ping":
+async def _handle_subscribe(websocket: WebSocket, message: dict):
+    device = message.get("device")
+    if device:
+        manager.subscribe_to_device(websocket, device)
         await manager.send_personal_message(
-            json.dumps({
-                "type": "pong",
-                "timestamp": datetime.now().isoformat()
+            _dumps({
+                "type": "subscription_confirmed",
+                "device": device,
+                "message": f"Subscribed to {device} updates"
             }),
             websocket
         )
-    
+
+async def _handle_unsubscribe(websocket: WebSocket, message: dict):
+    device = message.get("device")
+    if device:
+        manager.unsubscribe_from_device(websocket, device)
+        await manager.send_personal_message(
+            _dumps({
+                "type": "unsubscription_confirmed", 
+                "device": device,
+                "message": f"Unsubscribed from {device} updates"
+            }),
+            websocket
+        )
+
+async def _handle_ping(websocket: WebSocket, message: dict):
+    await manager.send_personal_message(
+        _dumps({
+            "type": "pong",
+            "timestamp": _now_iso()
+        }),
+        websocket
+    )
+
+_HANDLERS = {
+    "subscribe": _handle_subscribe,
+    "unsubscribe": _handle_unsubscribe,
+    "ping": _handle_ping,
+}
+
+async def handle_websocket_message(websocket: WebSocket, message: dict):
+    """Handle incoming WebSocket messages from clients"""
+    msg_type = message.get("type")
+    handler = _HANDLERS.get(msg_type)
+    if handler:
+        await handler(websocket, message)
     else:
         await manager.send_personal_message(
-            json.dumps({"error": f"Unknown message type: {msg_type}"}),
+            _dumps({"error": f"Unknown message type: {msg_type}"}),
             websocket
         )
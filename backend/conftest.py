@@ -0,0 +1,3 @@
+# backend/conftest.py
+# pytest puts this file's directory on sys.path, so tests can import the
+# `app` and `worker` packages whether pytest runs from backend/ or the repo root.
@@ -0,0 +1,18 @@
+# backend/server_options.py
+"""Uvicorn tuning shared by start_neuroshield.py and start_server.py"""
+import os
+
+
+def uvicorn_options():
+    """Worker, event loop, HTTP parser and WebSocket settings, overridable from the environment"""
+    return {
+        # Services keep in-process state (WebSocket clients, action queue),
+        # so only raise the worker count behind a shared Redis setup
+        "workers": int(os.getenv("UVICORN_WORKERS", "1")),
+        # "auto" picks uvloop and httptools when installed (uvicorn[standard])
+        "loop": os.getenv("UVICORN_LOOP", "auto"),
+        "http": os.getenv("UVICORN_HTTP", "auto"),
+        # permessage-deflate pays off for broadcasts over slow links; set
+        # NEUROSHIELD_WS_DEFLATE=0 for local/low-latency setups
+        "ws_per_message_deflate": os.getenv("NEUROSHIELD_WS_DEFLATE", "1") != "0",
+    }
@@ -7,8 +7,11 @@ Starts the FastAPI server and initializes all services
 import uvicorn
 import asyncio
 import logging
+import os
 from pathlib import Path
 
+from server_options import uvicorn_options
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -65,7 +68,10 @@ def main():
         host="0.0.0.0",
         port=8000,
         reload=False,
-        log_level="info"
+        log_level="info",
+        # Per-request access logging is costly on the ingest path; UVICORN_ACCESS_LOG=1 restores it
+        access_log=os.getenv("UVICORN_ACCESS_LOG", "0") == "1",
+        **uvicorn_options()
     )
 
 if __name__ == "__main__":
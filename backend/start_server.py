@@ -8,6 +8,8 @@ import logging
 import sys
 from pathlib import Path
 
+from server_options import uvicorn_options
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,7 +34,7 @@ def main():
         # Test service imports
         logger.info("🔧 Testing service imports...")
         try:
-            from app.services.model_service import ModelService
+            from app.services.model_service import get_model_service
             from app.services.db import db_service
             from app.services.broadcaster import broadcaster
             from app.services.network_automation import automation_service
@@ -44,7 +46,7 @@ def main():
         # Test model service
         logger.info("🤖 Testing model service...")
         try:
-            svc = ModelService()
+            svc = get_model_service()
             devices = svc.get_devices()
             logger.info(f"✅ Model service working, found {len(devices)} devices: {devices}")
         except Exception as e:
@@ -61,7 +63,8 @@ def main():
             port=8000,
             reload=False,
             log_level="info",
-            access_log=True
+            access_log=True,
+            **uvicorn_options()
         )
         
     except KeyboardInterrupt:
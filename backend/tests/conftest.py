@@ -0,0 +1,18 @@
+import os
+import shutil
+import tempfile
+
+_db_dir = None
+
+
+def pytest_configure(config):
+    # Point every DB_PATH reader at a throwaway database before `app` is imported,
+    # so test runs never touch the tracked backend/metrics.db
+    global _db_dir
+    _db_dir = tempfile.mkdtemp(prefix="neuroshield-test-")
+    os.environ["DB_PATH"] = os.path.join(_db_dir, "metrics.db")
+
+
+def pytest_unconfigure(config):
+    if _db_dir:
+        shutil.rmtree(_db_dir, ignore_errors=True)
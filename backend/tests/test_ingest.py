@@ -1,4 +1,9 @@
-import requests
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
 
 sample_payload = [{
     "Timestamp": "2024-04-20 00:00:00",
@@ -13,7 +18,45 @@ sample_payload = [{
     "Log Text": "Normal operation"
 }]
 
-resp = requests.post("http://localhost:8000/api/ingest", json=sample_payload)
 
-print("Status:", resp.status_code)
-print("Response:", resp.json())
\ No newline at end of file
+class FakeRedis:
+    """Records RPUSHes so ingest can be tested without a Redis server"""
+
+    def __init__(self):
+        self.lists = {}
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+
+@pytest.fixture(scope="module")
+def fake_redis():
+    fake = FakeRedis()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "r", fake)
+        yield fake
+
+
+@pytest.fixture(scope="module")
+def client(fake_redis):
+    # In-process ASGI client shared by the module; the lifespan (background services) is not started
+    return TestClient(main.app)
+
+
+def test_ingest_queues_logs(client, fake_redis):
+    resp = client.post("/api/ingest", json=sample_payload)
+
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "queued", "items": 1}
+    queued = json.loads(fake_redis.lists[main.QUEUE_KEY][-1])
+    assert queued["Device Name"] == "Router_A"
+    assert queued["Traffic Volume (MB/s)"] == 50.5
+
+
+def test_ingest_rejects_invalid_log(client):
+    bad = [dict(sample_payload[0], **{"Latency (ms)": "fast"})]
+
+    resp = client.post("/api/ingest", json=bad)
+
+    assert resp.status_code == 422
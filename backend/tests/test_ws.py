@@ -0,0 +1,35 @@
+import asyncio
+import json
+
+from app.ws import ConnectionManager
+
+
+class FakeWebSocket:
+    """Records sent frames; on_send runs once during the first send"""
+
+    def __init__(self):
+        self.sent = []
+        self.on_send = None
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+        if self.on_send:
+            callback, self.on_send = self.on_send, None
+            await callback()
+
+
+def test_metrics_update_during_broadcast_is_delivered():
+    async def scenario():
+        manager = ConnectionManager()
+        ws = FakeWebSocket()
+        manager.active_connections[ws] = None
+        # A second update arrives while the first flush is still broadcasting
+        ws.on_send = lambda: manager.send_metrics_update({"n": 2})
+        await manager.send_metrics_update({"n": 1})
+        await asyncio.sleep(manager.batch_window * 5)
+        return ws.sent, manager._pending_metrics
+
+    sent, pending = asyncio.run(scenario())
+
+    assert [frame["data"] for frame in sent] == [{"n": 1}, {"n": 2}]
+    assert pending == []
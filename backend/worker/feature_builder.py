@@ -1,4 +1,7 @@
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -14,6 +17,119 @@ NUMERIC_COLS = [
     "Bandwidth Allocated (MB/s)", "Bandwidth Used (MB/s)"
 ]
 
+# Continuous features are float32 (one-hots int8); recorded in meta.json so predictors align to it
+FEATURE_DTYPE = "float32"
+
+# Explicit dtypes for the router CSVs so the parser skips type inference on the metric columns
+CSV_DTYPES = {col: "float64" for col in NUMERIC_COLS}
+
+# router_logs columns under the canonical names used by the feature code
+ROUTER_LOGS_SELECT = "SELECT timestamp as 'Timestamp', device_name as 'Device Name', source_ip as 'Source IP', destination_ip as 'Destination IP', traffic_volume as 'Traffic Volume (MB/s)', latency as 'Latency (ms)', bandwidth_allocated as 'Bandwidth Allocated (MB/s)', bandwidth_used as 'Bandwidth Used (MB/s)', congestion_flag as 'Congestion Flag', log_text as 'Log Text' FROM router_logs"
+
+# Column-name clean-up applied before mapping to the canonical names
+_RE_US = re.compile(r"[_\s]+")             # underscores -> spaces
+_RE_MB = re.compile(r"\s*\(mb/s\)\s*")
+_RE_MS = re.compile(r"\s*\(ms\)\s*")
+_RE_WS = re.compile(r"\s+")
+
+def _norm_col(c):
+    c = _RE_US.sub(" ", str(c).strip())
+    c = _RE_MB.sub(" mb/s", c)
+    c = _RE_MS.sub(" ms", c)
+    return _RE_WS.sub(" ", c)
+
+def _add_ts_epoch(df):
+    """
+    Store Timestamp as int64 epoch seconds in ts_epoch so the feature code can use
+    integer arithmetic. NaT rows get an arbitrary value; Timestamp still marks them.
+    """
+    df["ts_epoch"] = df["Timestamp"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    return df
+
+def tune_connection(conn):
+    """
+    Apply the PRAGMAs shared by every router_logs reader/writer: WAL with
+    synchronous=NORMAL (no fsync per commit), in-memory temp tables, mmap reads
+    and a 64 MB page cache.
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    return conn
+
+@lru_cache(maxsize=1)
+def _read_router_logs_db(db_path, limit, version):
+    """
+    Read router_logs from SQLite. Only the latest (db_path, limit, version) frame is
+    kept, where version is the table's (row count, max id), so new rows replace it.
+    Callers get the shared frame and must copy it before modifying.
+    """
+    import sqlite3
+
+    q = ROUTER_LOGS_SELECT + " ORDER BY id ASC"
+    if limit:
+        q += f" LIMIT {int(limit)}"
+    conn = tune_connection(sqlite3.connect(db_path))
+    try:
+        df = pd.read_sql_query(q, conn)
+    finally:
+        conn.close()
+    # ROUTER_LOGS_SELECT already aliases every column to its canonical name,
+    # so the CSV-style normalisation and renaming are not needed here
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    _add_ts_epoch(df)
+    df = df.sort_values(["Device Name", "Timestamp"]).reset_index(drop=True)
+    return df
+
+
+def load_last_k(device, k=120):
+    """
+    Last k rows for one device read directly from router_logs through the
+    (device_name, id) index, oldest first. Returns an empty DataFrame if the
+    table is missing or has no rows for the device.
+    """
+    import sqlite3
+
+    q = ROUTER_LOGS_SELECT + " WHERE device_name = ? ORDER BY id DESC LIMIT ?"
+    try:
+        conn = tune_connection(sqlite3.connect(DB_PATH))
+        try:
+            cursor = conn.execute(q, (device, int(k)))
+            rows = cursor.fetchall()
+            columns = [d[0] for d in cursor.description]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(rows[::-1], columns=columns)
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    _add_ts_epoch(df)
+    return df
+
+
+def load_devices():
+    """
+    Distinct device names in router_logs, read through a device_name index.
+    Returns an empty list if the table is missing or empty.
+    """
+    import sqlite3
+
+    try:
+        conn = tune_connection(sqlite3.connect(DB_PATH))
+        try:
+            rows = conn.execute(
+                "SELECT DISTINCT device_name FROM router_logs WHERE device_name IS NOT NULL ORDER BY device_name"
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return []
+    return [row[0] for row in rows]
+
+
 def load_router_logs(limit=None):
     import sqlite3
     
@@ -24,65 +140,13 @@ def load_router_logs(limit=None):
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='router_logs'")
         if cursor.fetchone():
-            cursor.execute("SELECT COUNT(*) FROM router_logs")
-            count = cursor.fetchone()[0]
+            # Row count and last id identify the table contents for the cache
+            cursor.execute("SELECT COUNT(*), MAX(id) FROM router_logs")
+            count, max_id = cursor.fetchone()
             if count > 0:
-                q = "SELECT timestamp as 'Timestamp', device_name as 'Device Name', source_ip as 'Source IP', destination_ip as 'Destination IP', traffic_volume as 'Traffic Volume (MB/s)', latency as 'Latency (ms)', bandwidth_allocated as 'Bandwidth Allocated (MB/s)', bandwidth_used as 'Bandwidth Used (MB/s)', congestion_flag as 'Congestion Flag', log_text as 'Log Text' FROM router_logs ORDER BY id ASC"
-                if limit:
-                    q += f" LIMIT {int(limit)}"
-                df = pd.read_sql_query(q, conn)
                 conn.close()
-                # Continue with existing processing
-                cols = (
-                    df.columns.astype(str)
-                    .str.strip()
-                    .str.replace(r"[_\s]+", " ", regex=True)   # underscores -> spaces
-                    .str.replace(r"\s*\(mb/s\)\s*", " mb/s", regex=True)
-                    .str.replace(r"\s*\(ms\)\s*", " ms", regex=True)
-                    .str.replace(r"\s+", " ", regex=True)
-                )
-                df.columns = cols
-                # Continue with column mapping and rest of processing...
-                col_map = {}
-                for c in df.columns:
-                    cl = c.lower()
-                    if "timestamp" in cl:
-                        col_map[c] = "Timestamp"
-                    elif "device" in cl and "name" in cl:
-                        col_map[c] = "Device Name"
-                    elif "source" in cl and "ip" in cl:
-                        col_map[c] = "Source IP"
-                    elif "destination" in cl and "ip" in cl:
-                        col_map[c] = "Destination IP"
-                    elif "traffic" in cl and "mb" in cl:
-                        col_map[c] = "Traffic Volume (MB/s)"
-                    elif ("latency" in cl) or ("ms" in cl and "lat" in cl):
-                        col_map[c] = "Latency (ms)"
-                    elif "bandwidth" in cl and "allocated" in cl:
-                        col_map[c] = "Bandwidth Allocated (MB/s)"
-                    elif "bandwidth" in cl and ("used" in cl or "util" in cl):
-                        col_map[c] = "Bandwidth Used (MB/s)"
-                    elif "congestion" in cl:
-                        col_map[c] = "Congestion Flag"
-                    elif "log" in cl or "text" in cl:
-                        col_map[c] = "Log Text"
-                    else:
-                        col_map[c] = c
-
-                df = df.rename(columns=col_map)
-                expected = [
-                    "Timestamp", "Device Name", "Source IP", "Destination IP",
-                    "Traffic Volume (MB/s)", "Latency (ms)",
-                    "Bandwidth Allocated (MB/s)", "Bandwidth Used (MB/s)",
-                    "Congestion Flag", "Log Text"
-                ]
-                for e in expected:
-                    if e not in df.columns:
-                        df[e] = pd.NA
-
-                df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
-                df = df.sort_values(["Device Name", "Timestamp"]).reset_index(drop=True)
-                return df
+                limit = int(limit) if limit else None
+                return _read_router_logs_db(DB_PATH, limit, (count, max_id)).copy()
         conn.close()
     except Exception as e:
         print(f"Database loading failed, falling back to CSV: {e}")
@@ -94,15 +158,19 @@ def load_router_logs(limit=None):
         DATA_DIR / "Router_C_router_log_15_days.csv"
     ]
     
-    dfs = []
-    for csv_file in csv_files:
-        if csv_file.exists():
-            try:
-                df_temp = pd.read_csv(csv_file)
-                dfs.append(df_temp)
-                print(f"Loaded {len(df_temp)} records from {csv_file.name}")
-            except Exception as e:
-                print(f"Error loading {csv_file}: {e}")
+    def _read_csv(csv_file):
+        try:
+            df_temp = pd.read_csv(csv_file, dtype=CSV_DTYPES)
+            print(f"Loaded {len(df_temp)} records from {csv_file.name}")
+            return df_temp
+        except Exception as e:
+            print(f"Error loading {csv_file}: {e}")
+            return None
+
+    # The C parser releases the GIL, so the router files can be read in parallel
+    existing = [f for f in csv_files if f.exists()]
+    with ThreadPoolExecutor(max_workers=max(1, len(existing))) as ex:
+        dfs = [d for d in ex.map(_read_csv, existing) if d is not None]
     
     if not dfs:
         print("No CSV files found, returning empty DataFrame")
@@ -114,7 +182,7 @@ def load_router_logs(limit=None):
     
     # Populate database for future use
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = tune_connection(sqlite3.connect(DB_PATH))
         # Create table if not exists
         conn.execute("""
             CREATE TABLE IF NOT EXISTS router_logs (
@@ -131,12 +199,9 @@ def load_router_logs(limit=None):
                 log_text TEXT
             )
         """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_router_logs_device_id ON router_logs(device_name, id)")
         
-        # Clear existing data and insert new
-        conn.execute("DELETE FROM router_logs")
-        
-        # Map CSV columns to database columns
-        db_df = df.copy()
+        # CSV columns in router_logs column order
         column_mapping = {
             'Timestamp': 'timestamp',
             'Device Name': 'device_name',
@@ -149,13 +214,17 @@ def load_router_logs(limit=None):
             'Congestion Flag': 'congestion_flag',
             'Log Text': 'log_text'
         }
-        
-        # Rename columns for database insertion
-        db_df = db_df.rename(columns=column_mapping)
-        
-        # Insert into database
-        db_df.to_sql('router_logs', conn, if_exists='append', index=False)
-        conn.commit()
+        insert_sql = "INSERT INTO router_logs ({}) VALUES ({})".format(
+            ", ".join(column_mapping.values()), ", ".join("?" * len(column_mapping))
+        )
+        # NaN -> None so missing values are stored as NULL
+        db_df = df.reindex(columns=list(column_mapping)).astype(object)
+        db_df = db_df.where(db_df.notna(), None)
+
+        # Clear existing data and insert new in a single transaction
+        with conn:
+            conn.execute("DELETE FROM router_logs")
+            conn.executemany(insert_sql, db_df.itertuples(index=False, name=None))
         conn.close()
         print(f"Populated database with {len(df)} records")
     except Exception as e:
@@ -166,15 +235,7 @@ def load_router_logs(limit=None):
         df = df.head(int(limit))
 
     # 1) Normalize column names: strip, collapse whitespace/underscores, lower
-    cols = (
-        df.columns.astype(str)
-        .str.strip()
-        .str.replace(r"[_\s]+", " ", regex=True)   # underscores -> spaces
-        .str.replace(r"\s*\(mb/s\)\s*", " mb/s", regex=True)
-        .str.replace(r"\s*\(ms\)\s*", " ms", regex=True)
-        .str.replace(r"\s+", " ", regex=True)
-    )
-    df.columns = cols
+    df.columns = [_norm_col(c) for c in df.columns]
 
     # 2) Map cleaned names to canonical names expected by feature code
     # Build lower->canonical map for flexible matching
@@ -220,17 +281,45 @@ def load_router_logs(limit=None):
 
     # Normalize types & sorting
     df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    _add_ts_epoch(df)
     df = df.sort_values(["Device Name", "Timestamp"]).reset_index(drop=True)
     return df
 
 
-def _safe_roll(g, col, w):
-    return g[col].rolling(window=w, min_periods=max(1, w//2)).mean()
+ROLL_COLS = ["Bandwidth Used (MB/s)", "Latency (ms)", "Traffic Volume (MB/s)"]
+ROLL_WINDOWS = (5, 15, 60)
+
+def _segment_starts(keys):
+    """Start positions of the runs of equal keys in an array sorted by key"""
+    keys = np.asarray(keys)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+def _safe_roll(values, starts, w):
+    """
+    Rolling mean over each contiguous segment of a (rows, cols) float array, matching
+    pandas rolling(window=w, min_periods=max(1, w//2)).mean() per group (NaNs skipped).
+    Uses cumulative sums, so the cost is O(rows) whatever the window.
+    """
+    n = len(values)
+    valid = ~np.isnan(values)
+    zero = np.zeros((1, values.shape[1]))
+    csum = np.vstack([zero, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    ccnt = np.vstack([zero, np.cumsum(valid, axis=0)])
 
-def engineer_core_features(df: pd.DataFrame):
-    df = df.copy()
+    idx = np.arange(n)
+    seg_start = np.repeat(starts, np.diff(np.r_[starts, n]))
+    lo = np.maximum(idx - w + 1, seg_start)
+    total = csum[idx + 1] - csum[lo]
+    count = ccnt[idx + 1] - ccnt[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count >= max(1, w//2), total / count, np.nan)
 
-    # Ensure numeric columns are float
+def engineer_core_features(df: pd.DataFrame, *, inplace=False):
+    # With inplace=True the caller's frame is modified instead of copied first
+    if not inplace:
+        df = df.copy()
+
+    # Ensure numeric columns are float (float32)
     for col in [
         "Traffic Volume (MB/s)",
         "Latency (ms)",
@@ -238,7 +327,7 @@ def engineer_core_features(df: pd.DataFrame):
         "Bandwidth Used (MB/s)"
     ]:
 
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+        df[col] = pd.to_numeric(df[col], errors="coerce", downcast="float")
 
 
     # 🔑 Ensure no stray spaces in columns
@@ -248,21 +337,39 @@ def engineer_core_features(df: pd.DataFrame):
     df["utilization"] = df["Bandwidth Used (MB/s)"] / df["Bandwidth Allocated (MB/s)"].replace(0, np.nan)
     df["utilization"] = df["utilization"].fillna(0).clip(0, 5)
 
-    # Time features
-    df["hour_of_day"] = df["Timestamp"].dt.hour
-    df["day_of_week"] = df["Timestamp"].dt.dayofweek
+    # Time features from epoch seconds (day 0, 1970-01-01, was a Thursday: dayofweek 3)
+    if "ts_epoch" not in df.columns:
+        _add_ts_epoch(df)
+    epoch = df["ts_epoch"].to_numpy()
+    valid = df["Timestamp"].notna().to_numpy()
+    hour = pd.Series((epoch // 3600) % 24, index=df.index).astype(np.int8)
+    dow = pd.Series((epoch // 86400 + 3) % 7, index=df.index).astype(np.int8)
+    if not valid.all():
+        # NaT rows stay NaN, as the .dt accessors leave them
+        hour, dow = hour.where(valid), dow.where(valid)
+    df["hour_of_day"] = hour
+    df["day_of_week"] = dow
     df["is_weekend"] = (df["day_of_week"] >= 5).astype(int)
 
-    # Deltas & rollings per device
-    df = df.sort_values(["Device Name", "Timestamp"])
-    g = df.groupby("Device Name", group_keys=False)
+    # Deltas & rollings per device. Input comes sorted by device and timestamp
+    # (load_router_logs / load_last_k), so no re-sort here
+    df["Device Name"] = df["Device Name"].astype("category")
+    codes = df["Device Name"].cat.codes.to_numpy()
+    g = df.groupby("Device Name", sort=False, group_keys=False, observed=True)
 
-    for col in ["Bandwidth Used (MB/s)", "Latency (ms)", "Traffic Volume (MB/s)"]:
-        df[f"{col}_diff1"] = g[col].diff().fillna(0)
-        for w in (5, 15, 60):
-            df[f"{col}_ma{w}"] = _safe_roll(g, col, w).reset_index(drop=True)
+    # One grouped diff over all three columns
+    diffs = g[ROLL_COLS].diff().fillna(0)
+    for col in ROLL_COLS:
+        df[f"{col}_diff1"] = diffs[col]
+    # Rows are sorted by device, so each device is one contiguous segment
+    starts = _segment_starts(codes)
+    values = df[ROLL_COLS].to_numpy(dtype=float)
+    for w in ROLL_WINDOWS:
+        rolled = _safe_roll(values, starts, w)
+        for i, col in enumerate(ROLL_COLS):
+            df[f"{col}_ma{w}"] = rolled[:, i]
 
-    df["Congestion_Label"] = (df["Congestion Flag"].str.upper() == "YES").astype(int)
+    df["Congestion_Label"] = df["Congestion Flag"].isin(("Yes", "YES", "yes")).astype(int)
 
     # Select feature columns
     feat_cols = [
@@ -273,14 +380,18 @@ def engineer_core_features(df: pd.DataFrame):
         "Traffic Volume (MB/s)_ma5","Traffic Volume (MB/s)_ma15","Traffic Volume (MB/s)_ma60",
     ]
 
-    # One-hot device
-    df = pd.get_dummies(df, columns=["Device Name"], drop_first=False)
-    device_cols = [c for c in df.columns if c.startswith("Device Name_")]
+    # One-hot device from category codes (same columns as get_dummies, int8 instead of a copied frame)
+    device_cols = [f"Device Name_{c}" for c in df["Device Name"].cat.categories]
+    onehot = pd.DataFrame(
+        (codes[:, None] == np.arange(len(device_cols))).astype(np.int8),
+        index=df.index,
+        columns=device_cols,
+    )
 
-    X = df[feat_cols + device_cols].fillna(0)
+    X = pd.concat([df[feat_cols].astype(FEATURE_DTYPE).fillna(0.0), onehot], axis=1)
     y = df["Congestion_Label"].astype(int)
-    meta = {"feature_cols": feat_cols + device_cols, "device_cols": device_cols}
-    return X, y, df[["Timestamp"] + [c for c in df.columns if c.startswith("Device Name_")] ], meta
+    meta = {"feature_cols": feat_cols + device_cols, "device_cols": device_cols, "feature_dtype": FEATURE_DTYPE}
+    return X, y, pd.concat([df[["Timestamp"]], onehot], axis=1), meta
 
 def train_test_split_time(X, y, timestamps, test_frac=0.2):
     # Time-based split
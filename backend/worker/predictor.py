@@ -1,18 +1,26 @@
 # backend/worker/predictor.py
 import os
 import time
-import json
+import warnings
 import joblib
+import numpy as np
+import pandas as pd
 import requests
 import redis
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 HERE = Path(__file__).resolve()
 BASE_DIR = HERE.parents[2]
 MODEL_DIR = BASE_DIR / "backend" / "models_store"
 
 # Import feature builder
-from feature_builder import load_router_logs, engineer_core_features
+from feature_builder import load_devices, load_router_logs, load_last_k, engineer_core_features
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 API_URL = os.getenv("API_URL", "http://localhost:8000")
@@ -21,52 +29,107 @@ ACTION_TTL = int(os.getenv("ACTION_LOCK_TTL", "900"))
 r = redis.from_url(REDIS_URL)
 
 # Load models/meta
-meta = json.loads((MODEL_DIR / "meta.json").read_text())
+meta = json_loads((MODEL_DIR / "meta.json").read_bytes())
 clf = joblib.load(MODEL_DIR / "congestion_clf.joblib")
 iso = joblib.load(MODEL_DIR / "anomaly_iso.joblib")
 threshold = float(meta.get("threshold", 0.6))
 feature_cols = list(meta.get("feature_cols", []))
+# Models trained before feature_dtype was recorded used float64
+feature_dtype = np.dtype(meta.get("feature_dtype", "float64"))
+
+# The hot path passes plain arrays to models fitted on DataFrames
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+_steps = getattr(clf, "named_steps", {})
+if "scaler" in _steps and "model" in _steps and len(getattr(_steps["model"], "classes_", ())) == 2:
+    _scaler, _model = _steps["scaler"], _steps["model"]
+
+    def congestion_probs(X_np):
+        # Same as predict_proba(...)[:, 1] for a binary logistic model, without the pipeline's checks.
+        # Logistic sigmoid written with tanh so large |z| cannot overflow np.exp
+        z = _model.decision_function(_scaler.transform(X_np))
+        return 0.5 * (1.0 + np.tanh(0.5 * z))
+else:
+    def congestion_probs(X_np):
+        return clf.predict_proba(X_np)[:, 1]
+
+def anomaly_flags(X_np):
+    # IsolationForest.predict marks -1 where score_samples - offset_ < 0
+    return (iso.score_samples(X_np) < iso.offset_).astype(int)
 
-def align_row(x_row):
-    import pandas as pd
-    aligned = pd.DataFrame(0, index=[0], columns=feature_cols)
-    for c in x_row.index:
-        if c in aligned.columns:
-            aligned.at[0, c] = x_row[c]
-    return aligned.fillna(0).astype(float)
-
-def get_devices():
-    df = load_router_logs()
-    if df is None or df.empty:
-        return []
-    return sorted(df["Device Name"].dropna().unique().tolist())
-
-def get_last_k_for_device(device, k=120):
-    df = load_router_logs()
-    if df is None or df.empty:
-        return df
-    df_dev = df[df["Device Name"] == device].copy()
-    if df_dev.empty:
-        return df_dev
-    df_dev["Timestamp"] = pd.to_datetime(df_dev["Timestamp"], errors="coerce")
-    df_dev = df_dev.sort_values("Timestamp").reset_index(drop=True)
-    return df_dev.tail(int(k)).sort_values("Timestamp").reset_index(drop=True)
+# Warm both models once so the first tick doesn't pay for lazy initialisation
+_dummy = np.zeros((1, len(feature_cols)), dtype=feature_dtype)
+congestion_probs(_dummy)
+anomaly_flags(_dummy)
+
+# Training column positions, and a buffer reused by align_rows across ticks
+FEAT_IDX = {c: i for i, c in enumerate(feature_cols)}
+_buf = np.zeros((0, len(feature_cols)), dtype=feature_dtype)
+
+@lru_cache(maxsize=32)
+def _permutation(columns):
+    """(source, destination) column positions mapping a feature frame onto feature_cols"""
+    pairs = [(i, FEAT_IDX[c]) for i, c in enumerate(columns) if c in FEAT_IDX]
+    src, dst = zip(*pairs) if pairs else ((), ())
+    return np.array(src, dtype=np.intp), np.array(dst, dtype=np.intp)
+
+def align_rows(X):
+    """
+    Feature rows reordered to the training columns as an array; columns the model
+    never saw are dropped, missing ones and NaNs are 0. The result is a view of a
+    shared buffer, valid until the next call.
+    """
+    global _buf
+    n = len(X)
+    if _buf.shape[0] < n:
+        _buf = np.zeros((n, len(feature_cols)), dtype=feature_dtype)
+    out = _buf[:n]
+    out.fill(0)
+    src, dst = _permutation(tuple(X.columns))
+    out[:, dst] = X.to_numpy(dtype=feature_dtype)[:, src]
+    out[np.isnan(out)] = 0
+    return out
+
+def device_windows(k=120):
+    """
+    Yield (device, last k rows sorted by Timestamp) for every device. Reads each
+    device through the (device_name, id) index; falls back to one full load when
+    router_logs is empty (CSV mode).
+    """
+    devices = load_devices()
+    if devices:
+        for dev in devices:
+            yield dev, load_last_k(dev, k).sort_values("Timestamp", kind="stable").reset_index(drop=True)
+        return
+    df_all = load_router_logs()
+    if df_all is None or df_all.empty:
+        return
+    # The loader returns rows sorted by device and timestamp
+    for dev, df_dev in df_all.groupby("Device Name", sort=True):
+        yield dev, df_dev.tail(k).reset_index(drop=True)
 
 def main_loop():
     print("Predictor started, press Ctrl+C to stop.")
     while True:
         try:
-            devices = get_devices()
-            for dev in devices:
-                df = get_last_k_for_device(dev, k=120)
-                if df.empty or len(df) < 10:
+            # Latest feature row of every device, scored in one call per model
+            devices, rows = [], []
+            for dev, df in device_windows(120):
+                if len(df) < 10:
                     continue
-                X_all, y_all, ts_df, _ = engineer_core_features(df)
-                x_last = X_all.iloc[[-1]]
-                x_aligned = align_row(x_last.iloc[0])
-                prob = float(clf.predict_proba(x_aligned)[:, 1][0])
-                anom = int(iso.predict(x_aligned)[0] == -1)
+                X_all, y_all, ts_df, _ = engineer_core_features(df, inplace=True)
+                devices.append(dev)
+                rows.append(X_all.iloc[[-1]])
+            if not rows:
+                time.sleep(60)
+                continue
+
+            X_np = align_rows(pd.concat(rows, ignore_index=True))
+            probs = congestion_probs(X_np)
+            anoms = anomaly_flags(X_np)
 
+            for dev, prob, anom in zip(devices, probs, anoms):
+                prob, anom = float(prob), int(anom)
                 lock_key = f"is_action_active:{dev}"
                 locked = r.get(lock_key)
 
@@ -1,8 +1,17 @@
+import argparse
 import os
 import pandas as pd
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from feature_builder import CSV_DTYPES
 
 API_URL = "http://localhost:8000/api/ingest"
 
@@ -16,34 +25,77 @@ ROUTER_FILES = {
     "Router_C": os.path.join(DATA_DIR, "Router_C_router_log_15_days.csv"),
 }
 
-def stream_router(router_name, csv_file, delay=1):
-    """Send logs row by row from a router CSV file"""
-    df = pd.read_csv(csv_file)
-
-    for _, row in df.iterrows():
-        payload = [{
-            "Timestamp": row["Timestamp"],
-            "Device Name": row["Device Name"],
-            "Source IP": row["Source IP"],
-            "Destination IP": row["Destination IP"],
-            "Traffic Volume (MB/s)": row["Traffic Volume (MB/s)"],
-            "Latency (ms)": row["Latency (ms)"],
-            "Bandwidth Allocated (MB/s)": row["Bandwidth Allocated (MB/s)"],
-            "Bandwidth Used (MB/s)": row["Bandwidth Used (MB/s)"],
-            "Congestion Flag": row["Congestion Flag"],
-            "Log Text": row["Log Text"],
-        }]
-        try:
-            resp = requests.post(API_URL, json=payload)
-            print(f"[{router_name}] Sent {row['Timestamp']} -> {resp.status_code}")
-        except Exception as e:
-            print(f"[{router_name}] Error: {e}")
-        time.sleep(delay)
+# Columns sent to the ingest endpoint, in payload order
+PAYLOAD_COLUMNS = [
+    "Timestamp",
+    "Device Name",
+    "Source IP",
+    "Destination IP",
+    "Traffic Volume (MB/s)",
+    "Latency (ms)",
+    "Bandwidth Allocated (MB/s)",
+    "Bandwidth Used (MB/s)",
+    "Congestion Flag",
+    "Log Text",
+]
+
+# Shared by every router thread; the pool keeps keep-alive connections for concurrent posts.
+# Retry covers connection failures only, since POST is not retried after a read error
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(
+    pool_connections=32, pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.2),
+))
+SESSION.headers["Content-Type"] = "application/json"
+
+def _report(router_name, payload, future):
+    try:
+        resp = future.result()
+        print(f"[{router_name}] Sent {len(payload)} rows up to {payload[-1]['Timestamp']} -> {resp.status_code}")
+    except Exception as e:
+        print(f"[{router_name}] Error: {e}")
+
+def stream_router(router_name, csv_file, delay=1, batch_size=100, workers=1):
+    """
+    Send logs from a router CSV file in batches of batch_size rows, up to workers posts
+    in flight. With the default single worker a router's batches arrive in order, so
+    router_logs ids keep following timestamps (load_last_k relies on that).
+    """
+    df = pd.read_csv(csv_file, usecols=PAYLOAD_COLUMNS, dtype=CSV_DTYPES)
+
+    # One vectorised conversion to plain dicts instead of a Series per row
+    rows = df[PAYLOAD_COLUMNS].to_dict("records")
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for start in range(0, len(rows), batch_size):
+            payload = rows[start:start + batch_size]
+            future = ex.submit(SESSION.post, API_URL, data=orjson.dumps(payload), timeout=10)
+            future.add_done_callback(partial(_report, router_name, payload))
+            # Keep the original pace of one row per delay seconds; a slow post no longer holds up the next
+            time.sleep(delay * len(payload))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay router CSV logs into the ingest API")
+    parser.add_argument("--files", nargs="+", metavar="CSV",
+                        help="CSV files to replay (default: the three bundled routers)")
+    parser.add_argument("--delay", type=float, default=1,
+                        help="seconds per row (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="rows per POST (default: 100)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="concurrent POSTs per router; above 1 batches may arrive out of order (default: 1)")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    if args.files:
+        files = {Path(f).stem: f for f in args.files}
+    else:
+        files = ROUTER_FILES
+
+    print(f"🚀 Starting multi-router simulation ({', '.join(files)})")
     threads = []
-    for router, path in ROUTER_FILES.items():
-        t = threading.Thread(target=stream_router, args=(router, path))
+    for router, path in files.items():
+        t = threading.Thread(target=stream_router, args=(router, path, args.delay, args.batch_size, args.workers))
         threads.append(t)
         t.start()
 
@@ -52,5 +104,4 @@ def main():
         t.join()
 
 if __name__ == "__main__":
-    print("🚀 Starting multi-router simulation (Router_A, Router_B, Router_C)")
-    main()
\ No newline at end of file
+    main()
@@ -17,7 +17,7 @@ MODEL_DIR.mkdir(parents=True, exist_ok=True)
 def main():
     # 1. Load router logs
     df = load_router_logs()
-    X, y, ts_df, meta = engineer_core_features(df)
+    X, y, ts_df, meta = engineer_core_features(df, inplace=True)
 
     # 2. Time-based split
     (Xtr, ytr), (Xte, yte) = train_test_split_time(X, y, ts_df["Timestamp"], test_frac=0.2)
@@ -1,10 +1,26 @@
 
-import os, json, sqlite3, asyncio
+import os, sqlite3, asyncio
+from operator import itemgetter
 import redis.asyncio as redis
 
+from feature_builder import tune_connection
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+try:
+    import uvloop  # installed with uvicorn[standard]
+except ImportError:
+    uvloop = None
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 QUEUE_KEY = os.getenv("QUEUE_KEY", "telegraf:metrics")
 DB_PATH   = os.getenv("DB_PATH", "metrics.db")
+BATCH_SIZE = int(os.getenv("WRITER_BATCH", "1000"))
+IDLE_SLEEP = 0.05  # seconds to wait when the queue is empty
+FLUSH_QUEUE = 4    # parsed batches allowed to wait for the SQLite insert
 
 
 def ensure_schema(conn: sqlite3.Connection):
@@ -23,7 +39,8 @@ def ensure_schema(conn: sqlite3.Connection):
         Log_Text TEXT
     )
     """)
-    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_router_logs_device_id ON router_logs(Device_Name, id)")
+    tune_connection(conn)
     conn.commit()
 
 
@@ -42,29 +59,98 @@ def extract_row(m: dict):
     )
 
 
+# Message keys in INSERT_SQL column order
+ROW_FIELDS = (
+    "Timestamp", "Device Name", "Source IP", "Destination IP",
+    "Traffic Volume (MB/s)", "Latency (ms)",
+    "Bandwidth Allocated (MB/s)", "Bandwidth Used (MB/s)",
+    "Congestion Flag", "Log Text",
+)
+_get_row = itemgetter(*ROW_FIELDS)
+
+
+def extract_rows(messages):
+    """
+    Rows for a batch of decoded messages. Messages from /api/ingest carry every
+    field already typed, so one itemgetter call per row is enough; anything
+    incomplete goes through extract_row's defaults.
+    """
+    rows = []
+    for m in messages:
+        try:
+            rows.append(_get_row(m))
+        except KeyError:
+            rows.append(extract_row(m))
+    return rows
+
+
+INSERT_SQL = """
+    INSERT INTO router_logs
+    (Timestamp, Device_Name, Source_IP, Destination_IP,
+     Traffic_Volume, Latency, Bandwidth_Allocated, Bandwidth_Used,
+     Congestion_Flag, Log_Text)
+    VALUES (?,?,?,?,?,?,?,?,?,?)
+"""
+
+
+async def drain(r, use_lmpop):
+    """Pop up to BATCH_SIZE items in one round trip; LMPOP needs Redis >= 7"""
+    if use_lmpop:
+        popped = await r.lmpop(1, QUEUE_KEY, direction="LEFT", count=BATCH_SIZE)
+        return popped[1] if popped else []
+    # Older servers: the same drain as LRANGE + LTRIM inside MULTI/EXEC
+    pipe = r.pipeline()
+    pipe.lrange(QUEUE_KEY, 0, BATCH_SIZE - 1)
+    pipe.ltrim(QUEUE_KEY, BATCH_SIZE, -1)
+    batch, _ = await pipe.execute()
+    return batch
+
+
+def insert_rows(conn, rows):
+    # One transaction (and one fsync) per batch instead of per row
+    with conn:
+        conn.executemany(INSERT_SQL, rows)
+
+
+async def flusher(conn, pending: asyncio.Queue):
+    """Insert queued batches off the event loop, one at a time, so Redis draining overlaps disk I/O"""
+    while True:
+        rows = await pending.get()
+        await asyncio.to_thread(insert_rows, conn, rows)
+
+
+async def drainer(r, pending: asyncio.Queue):
+    use_lmpop = True
+    while True:
+        try:
+            batch = await drain(r, use_lmpop)
+        except redis.ResponseError:
+            if not use_lmpop:
+                raise
+            print("LMPOP not supported by this Redis server, using LRANGE/LTRIM")
+            use_lmpop = False
+            continue
+        if not batch:
+            await asyncio.sleep(IDLE_SLEEP)
+            continue
+
+        # Blocks when FLUSH_QUEUE batches are already waiting for SQLite
+        await pending.put(extract_rows([json_loads(data) for data in batch]))
+
+
 async def main():
+    # Only the flusher's worker thread touches the connection, one batch at a time
     conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     ensure_schema(conn)
     r = redis.from_url(REDIS_URL, decode_responses=True)
+    pending = asyncio.Queue(maxsize=FLUSH_QUEUE)
 
     print("Writer started. Waiting for metrics...")
-    while True:
-        item = await r.blpop(QUEUE_KEY, timeout=5)
-        if not item:
-            continue
-        _, data = item
-        payload = json.loads(data)
-
-        row = extract_row(payload)
-        conn.execute("""
-            INSERT INTO router_logs
-            (Timestamp, Device_Name, Source_IP, Destination_IP,
-             Traffic_Volume, Latency, Bandwidth_Allocated, Bandwidth_Used,
-             Congestion_Flag, Log_Text)
-            VALUES (?,?,?,?,?,?,?,?,?,?)
-        """, row)
-        conn.commit()
+    # Either task failing ends the writer, as an error in the old single loop did
+    await asyncio.gather(drainer(r, pending), flusher(conn, pending))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # Prefer the libuv-based loop when available
+    run = getattr(uvloop, "run", asyncio.run)
+    run(main())
\ No newline at end of file